@@ -1,9 +1,12 @@
 import os
+import re
 from pathlib import Path
 from my_sdk.core.interfaces import PipelineStep, ReconstructionContext
 from my_sdk.utils.docker_runner import DockerRunner
 from my_sdk.utils.opensfm_exporter import convert_opensfm_to_nerf
 
+_PLY_VERTEX_RE = re.compile(rb"element vertex (\d+)")
+
 class GSToPCAdapter(PipelineStep):
     """
     Adapter for 3DGS-to-PC tool.
@@ -53,8 +56,8 @@ class GSToPCAdapter(PipelineStep):
         if not host_data_dir:
             raise ValueError("HOST_DATA_DIR environment variable is missing. Required for DooD.")
 
-        rel_run_path = context.run_dir.relative_to(context.config.working_dir)
-        host_run_dir = Path(host_data_dir) / rel_run_path
+        # Host path is cached on the context (see ReconstructionContext)
+        host_run_dir = context.host_run_dir
         
         # In container paths (same as opensplat for consistency)
         container_project = "/project"
@@ -110,13 +113,11 @@ class GSToPCAdapter(PipelineStep):
 
     def _extract_metrics(self, context: ReconstructionContext):
         """Extract points count from the generated PLY file."""
-        import re
         dense_pc = context.run_dir / "3d_gsl" / "dense_pc.ply"
         if dense_pc.exists():
             try:
                 with open(dense_pc, "rb") as f:
-                    header = f.read(2048).decode(errors='ignore')
-                    v_match = re.search(r"element vertex (\d+)", header)
+                    v_match = _PLY_VERTEX_RE.search(f.read(2048))
                     if v_match:
                         context.metrics.setdefault("gs_to_pc", {})["point_count"] = int(v_match.group(1))
             except Exception as e:
@@ -1,17 +1,49 @@
+import mmap
+import os
+import re
 import subprocess
+from collections import deque
 from pathlib import Path
 from my_sdk.core.interfaces import ReconstructionStrategy, ReconstructionContext
 from my_sdk.utils.docker_runner import DockerRunner
 
+# Training-log patterns, compiled once (bytes: logs are scanned without decoding)
+_LOSS_RE = re.compile(rb"Step\s+\d+:\s+([\d.]+)")
+_GAUSS_RE = re.compile(rb"([\d,]+)\s*gaussians?\s*(?:remaining)?", re.IGNORECASE)
+_PLY_VERTEX_RE = re.compile(rb"element vertex (\d+)")
+
+# How much of the log tail to search for the (last) gaussian count
+_LOG_TAIL_BYTES = 65536
+
+# Static docker argv fragment, built once at import instead of per run
+_STATIC_DOCKER_ENV = (
+    "-e", "NVIDIA_VISIBLE_DEVICES=all",
+    "-e", "NVIDIA_DRIVER_CAPABILITIES=all",
+)
+
+
 class OpenSplatAdapter(ReconstructionStrategy):
     """
     Adapter for OpenSplat (Gaussian Splatting).
     Wraps the 'opensplat' command.
-    
+
     Uses OpenSfM output directly with --opensfm-image-path to specify
     the separate images directory.
     """
-    
+
+    # Iteration / save-frequency presets keyed by quality_preset
+    _PRESETS = {
+        "high": {"n": 30000, "s": 5000},
+        "medium": {"n": 15000, "s": 2000},
+        "low": {"n": 7000, "s": 1000},
+    }
+
+    # Container-side paths, constant across runs
+    CONTAINER_PROJECT = "/project"
+    CONTAINER_IMAGES = "/images"
+    CONTAINER_OPENSFM = "/project/opensfm"
+    CONTAINER_OUTPUT = "/project/3d_gsl/splat.ply"
+
     def run(self, context: ReconstructionContext) -> bool:
         print("[OpenSplat] Starting Gaussian Splatting reconstruction...")
         
@@ -44,17 +76,13 @@ class OpenSplatAdapter(ReconstructionStrategy):
             "auto-stop-on-same-size": True  # Enable OpenSplat auto-stop by default
         }
         
-        # Mapping quality logic
-        if context.config.quality_preset == "high":
-            splat_params["n"] = 30000  # iterations
-            splat_params["s"] = 5000   # save every N iterations
-        elif context.config.quality_preset == "low":
-            splat_params["n"] = 7000
-            splat_params["s"] = 1000
-        else:  # medium
-            splat_params["n"] = 15000
-            splat_params["s"] = 2000
-            
+        # Mapping quality logic: n = iterations, s = save every N iterations
+        # (unknown presets fall back to medium, as before)
+        splat_params.update(
+            self._PRESETS.get(context.config.quality_preset, self._PRESETS["medium"])
+        )
+
+
         # User overrides (highest priority)
         user_overrides = context.config.params.get("opensplat", {})
         # Map 'iterations' to 'n' for backward compatibility
@@ -66,18 +94,13 @@ class OpenSplatAdapter(ReconstructionStrategy):
         splat_params.update(user_overrides)
 
         # 3. Construct Docker Command with DooD (Docker-outside-of-Docker)
-        import os
         host_data_dir = os.environ.get("HOST_DATA_DIR")
         if not host_data_dir:
             raise ValueError("HOST_DATA_DIR environment variable is missing. Required for DooD.")
 
-        # Reconstruct host paths
-        images_src = Path(context.config.input_images_dir)
-        rel_run_path = context.run_dir.relative_to(context.config.working_dir)
-        rel_images_path = images_src.relative_to(context.config.working_dir)
-        
-        host_run_dir = Path(host_data_dir) / rel_run_path
-        host_images_dir = Path(host_data_dir) / rel_images_path
+        # Host paths are cached on the context (see ReconstructionContext)
+        host_run_dir = context.host_run_dir
+        host_images_dir = context.host_images_dir
         
         docker_image = context.config.algorithms.reconstruction_docker_image
         
@@ -87,46 +110,52 @@ class OpenSplatAdapter(ReconstructionStrategy):
             print("[OpenSplat] WARNING: GPU not available or nvidia-docker not configured. Attempting CPU-only reconstruction.")
             print("[OpenSplat] TIP: Gaussian Splatting is extremely slow on CPU. For better performance, please use an NVIDIA GPU.")
         
-        # Container paths
-        container_project = "/project"
-        container_images = "/images"
-        container_opensfm = f"{container_project}/opensfm"
-        container_output = f"{container_project}/3d_gsl/splat.ply"
-        
-        # Build Docker command
-        command = [
-            "docker", "run", "--rm",
-            "-v", f"{host_run_dir}:{container_project}",
-            "-v", f"{host_images_dir}:{container_images}:ro",
-            "-e", "NVIDIA_VISIBLE_DEVICES=all",
-            "-e", "NVIDIA_DRIVER_CAPABILITIES=all",
-            docker_image,
+        # Only the mount specs vary per run; the env fragment is prebuilt
+        mounts = [
+            "-v", f"{host_run_dir}:{self.CONTAINER_PROJECT}",
+            "-v", f"{host_images_dir}:{self.CONTAINER_IMAGES}:ro",
+            *_STATIC_DOCKER_ENV,
+        ]
+
+        # opensplat invocation, shared by the exec and one-shot paths
+        opensplat_argv = [
             "opensplat",
-            container_opensfm,                          # Input: OpenSfM project directory
-            "-o", container_output,                     # Output: PLY file
-            "--opensfm-image-path", container_images,   # Separate images path
+            self.CONTAINER_OPENSFM,                         # Input: OpenSfM project directory
+            "-o", self.CONTAINER_OUTPUT,                    # Output: PLY file
+            "--opensfm-image-path", self.CONTAINER_IMAGES,  # Separate images path
         ]
 
-        if use_gpu:
-            command.insert(2, "--gpus")
-            command.insert(3, "all")
-        
-        # Add splat parameters
+        # Add splat parameters (short option: -n, -s / long option: --sh-degree)
         for k, v in splat_params.items():
+            opt = f"-{k}" if len(k) == 1 else f"--{k}"
             if isinstance(v, bool):
                 if v:  # Only add boolean flags if True (e.g., --keep-crs)
-                    if len(k) == 1:
-                        command.append(f"-{k}")
-                    else:
-                        command.append(f"--{k}")
+                    opensplat_argv.append(opt)
             else:
-                if len(k) == 1:
-                    command.extend([f"-{k}", str(v)])   # Short option: -n, -s
-                else:
-                    command.extend([f"--{k}", str(v)])  # Long option: --sh-degree
+                opensplat_argv.extend((opt, str(v)))
 
         # 4. Execute using DockerRunner
-        success = runner.run(command, step_name="OpenSplat")
+        # Opt-in: the persistent helper only pays off when several commands
+        # exec into the same container; this stage runs exactly one, so a
+        # one-shot docker run is strictly less lifecycle work and is the
+        # default. Falls back to one-shot when the helper cannot be started.
+        container_id = None
+        if context.config.params.get("opensplat", {}).get("persistent_docker", False):
+            container_id = runner.start_persistent(docker_image, mounts, gpu=use_gpu, step_name="OpenSplat")
+
+        if container_id:
+            try:
+                success = runner.exec_in(container_id, opensplat_argv, step_name="OpenSplat")
+            finally:
+                DockerRunner.stop_persistent(container_id)
+        else:
+            command = ["docker", "run", "--rm"]
+            if use_gpu:
+                command.extend(["--gpus", "all"])
+            command.extend(mounts)
+            command.append(docker_image)
+            command.extend(opensplat_argv)
+            success = runner.run(command, step_name="OpenSplat")
         
         if success:
             print(f"[OpenSplat] Reconstruction finished. Result at {output_ply}")
@@ -136,53 +165,74 @@ class OpenSplatAdapter(ReconstructionStrategy):
     
     def _extract_metrics(self, context: ReconstructionContext):
         """Extract and store Gaussian Splatting metrics from training logs."""
-        import re
         metrics = {
             "stage": "GaussianSplatting",
             "final_loss": None,
             "gaussian_count": None,
             "status": "Success"
         }
-        
+
         # Prefer unified sdk.log if present; fallback to opensplat_*.log (legacy)
-        log_content = ""
+        log_path = None
         sdk_log = context.log_path / "sdk.log"
         if sdk_log.exists():
+            log_path = sdk_log
+        else:
+            # scandir returns DirEntry objects whose stat() is served from the
+            # directory read on Linux - no extra syscall per rotated log file
+            try:
+                with os.scandir(context.log_path) as it:
+                    log_path = max(
+                        (e for e in it if e.name.startswith("opensplat_") and e.name.endswith(".log")),
+                        key=lambda e: e.stat().st_mtime,
+                        default=None
+                    )
+                if log_path is not None:
+                    log_path = Path(log_path.path)
+            except OSError:
+                pass
+
+        if log_path is not None:
             try:
-                log_content = sdk_log.read_text(encoding="utf-8", errors="ignore")
+                # 1. Loss from OpenSplat format: "Step 2000: 0.103071 (100%)"
+                # mmap the log and let the regex engine scan the whole buffer
+                # in C - much faster than per-line Python iteration on the
+                # GB-scale logs a 30k-iteration run produces. The deque still
+                # bounds the retained history.
+                loss_history = deque(maxlen=1000)
+                count_matches = []
+                with open(log_path, "rb") as f:
+                    size = os.fstat(f.fileno()).st_size
+                    if size > 0:
+                        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                            loss_history.extend(
+                                float(m.group(1)) for m in _LOSS_RE.finditer(mm)
+                            )
+
+                            # 2. Gaussian Count from the "gaussians remaining"
+                            # pattern: only the last value matters, so search
+                            # a bounded tail
+                            tail = mm[max(size - _LOG_TAIL_BYTES, 0):]
+                            count_matches = _GAUSS_RE.findall(tail)
+
+                if loss_history:
+                    metrics["loss_history"] = list(loss_history)
+                    metrics["final_loss"] = loss_history[-1]
+                if count_matches:
+                    # Remove commas and get last value
+                    metrics["gaussian_count"] = int(count_matches[-1].replace(b",", b""))
             except Exception as e:
-                print(f"[OpenSplat] Warning: Could not read sdk.log: {e}")
-        else:
-            log_files = list(context.log_path.glob("opensplat_*.log"))
-            if log_files:
-                latest_log = max(log_files, key=lambda x: x.stat().st_mtime)
-                try:
-                    log_content = latest_log.read_text(encoding="utf-8", errors="ignore")
-                except Exception as e:
-                    print(f"[OpenSplat] Warning: Could not parse logs for metrics: {e}")
-
-        if log_content:
-            # 1. Loss from OpenSplat format: "Step 2000: 0.103071 (100%)"
-            loss_matches = re.findall(r"Step\s+\d+:\s+([\d.]+)", log_content)
-            if loss_matches:
-                metrics["loss_history"] = [float(l) for l in loss_matches]
-                metrics["final_loss"] = float(loss_matches[-1])
-            
-            # 2. Gaussian Count: Try parsing from log "gaussians remaining" pattern
-            count_matches = re.findall(r"([\d,]+)\s*gaussians?\s*(?:remaining)?", log_content, re.IGNORECASE)
-            if count_matches:
-                # Remove commas and get last value
-                metrics["gaussian_count"] = int(count_matches[-1].replace(",", ""))
-        
+                print(f"[OpenSplat] Warning: Could not parse logs for metrics: {e}")
+
         # 3. Fallback: Get gaussian count from PLY file header
         if metrics["gaussian_count"] is None:
             splat_ply = context.run_dir / "3d_gsl" / "splat.ply"
             if splat_ply.exists():
                 try:
                     with open(splat_ply, "rb") as f:
-                        header = f.read(2048).decode(errors='ignore')
                         # PLY header: "element vertex 123456"
-                        v_match = re.search(r"element vertex (\d+)", header)
+                        # Matched on raw bytes - no decode of the header needed
+                        v_match = _PLY_VERTEX_RE.search(f.read(2048))
                         if v_match:
                             metrics["gaussian_count"] = int(v_match.group(1))
                 except Exception as e:
@@ -1,9 +1,72 @@
+import copy
+import hashlib
 import json
 import os
+import pickle
 from pathlib import Path
 from typing import Dict, Any, Optional
 from pydantic import BaseModel, Field
 
+try:
+    import orjson  # Optional: Rust JSON parser, ~3-5x faster on configs
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
+
+# In-process parse cache for from_file, keyed by path identity + stat.
+# Repeated loads of the same config within one process (multi-stage CLI
+# usage, sweeps, servers) skip file I/O and parsing entirely; the on-disk
+# pickle cache below covers cross-process restarts.
+_CONFIG_CACHE: Dict[tuple, 'TaskConfig'] = {}
+
+# Validated-config cache: skips the Pydantic field-by-field validation on
+# warm starts (resume/retry of the same config). Keyed by a hash of the raw
+# file bytes plus everything that influences working_dir resolution.
+_CONFIG_CACHE_DIR = Path.home() / ".cache" / "my_sdk"
+
+
+def _config_digest(raw: bytes, config_path: str) -> str:
+    key = raw + f"|{os.environ.get('DATA_DIR')}|{config_path}".encode()
+    return hashlib.blake2b(key, digest_size=16).hexdigest()
+
+
+def _schema_fingerprint(cls) -> tuple:
+    fields = getattr(cls, "model_fields", None) or getattr(cls, "__fields__", {})
+    return tuple(sorted(fields))
+
+
+def _cached_config_load(digest: str):
+    """Return a previously validated TaskConfig for this digest, or None."""
+    try:
+        with open(_CONFIG_CACHE_DIR / f"config-{digest}.pkl", "rb") as f:
+            cached = pickle.load(f)
+        if cached.get("schema") == _schema_fingerprint(TaskConfig):
+            return cached["config"]
+    except Exception:
+        pass
+    return None
+
+
+def _validate_config(cls, data: dict) -> 'TaskConfig':
+    """
+    Construct a TaskConfig from parsed data.
+    On pydantic v2 model_validate runs the whole validation in pydantic-core
+    (compiled), noticeably faster than keyword construction; v1 installs
+    fall back to cls(**data).
+    """
+    if hasattr(cls, "model_validate"):
+        return cls.model_validate(data)
+    return cls(**data)
+
+
+def _cached_config_store(digest: str, config: 'TaskConfig'):
+    try:
+        _CONFIG_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        with open(_CONFIG_CACHE_DIR / f"config-{digest}.pkl", "wb") as f:
+            pickle.dump({"schema": _schema_fingerprint(TaskConfig), "config": config}, f)
+    except Exception:
+        pass  # Cache is best-effort
+
 class CoordinateSystem(BaseModel):
     type: int = 2
     label: str = "WGS 84"
@@ -90,10 +153,18 @@ class TaskConfig(BaseModel):
     def from_json(cls, json_path: str) -> 'TaskConfig':
         """Load config from JSON file. Infers working_dir from file location if not set."""
         json_path = str(Path(json_path).resolve())
-        with open(json_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
-        
+        with open(json_path, 'rb') as f:
+            raw = f.read()
+
+        digest = _config_digest(raw, json_path)
+        cached = _cached_config_load(digest)
+        if cached is not None:
+            cached.validate_paths()
+            return cached
+
+        data = _loads(raw)
+
+
         # Priority 1: DATA_DIR environment variable (Override)
         env_data_dir = os.environ.get("DATA_DIR")
         if env_data_dir:
@@ -105,11 +176,12 @@ class TaskConfig(BaseModel):
         elif data.get('working_dir') is None:
             data['working_dir'] = str(Path(json_path).parent)
             print(f"[Config] working_dir auto-inferred: {data['working_dir']}")
-            
-        config = cls(**data)
+
+        config = _validate_config(cls, data)
         config.validate_paths()
+        _cached_config_store(digest, config)
         return config
-    
+
     @classmethod
     def from_yaml(cls, yaml_path: str) -> 'TaskConfig':
         """Load config from YAML file. Infers working_dir from file location if not set."""
@@ -117,12 +189,26 @@ class TaskConfig(BaseModel):
             import yaml
         except ImportError:
             raise ImportError("PyYAML is required for YAML config files. Install with: pip install pyyaml")
-        
+
+        # The C loader (libyaml) parses ~10x faster than the pure-Python default
+        try:
+            from yaml import CSafeLoader as _Loader
+        except ImportError:
+            from yaml import SafeLoader as _Loader
+
         yaml_path = str(Path(yaml_path).resolve())
-        with open(yaml_path, 'r', encoding='utf-8') as f:
-            data = yaml.safe_load(f)
-        
-        
+        with open(yaml_path, 'rb') as f:
+            raw = f.read()
+
+        digest = _config_digest(raw, yaml_path)
+        cached = _cached_config_load(digest)
+        if cached is not None:
+            cached.validate_paths()
+            return cached
+
+        data = yaml.load(raw, Loader=_Loader)
+
+
         # Priority 1: DATA_DIR environment variable (Override)
         env_data_dir = os.environ.get("DATA_DIR")
         if env_data_dir:
@@ -134,16 +220,35 @@ class TaskConfig(BaseModel):
         elif data.get('working_dir') is None:
             data['working_dir'] = str(Path(yaml_path).parent)
             print(f"[Config] working_dir auto-inferred: {data['working_dir']}")
-        
-        config = cls(**data)
+
+        config = _validate_config(cls, data)
         config.validate_paths()
+        _cached_config_store(digest, config)
         return config
-    
+
     @classmethod
     def from_file(cls, config_path: str) -> 'TaskConfig':
         """Load config from file, auto-detecting format by extension."""
+        # In-process cache hit: return a copy so caller mutations never leak
+        # back into the cache. DATA_DIR is part of the key because it
+        # overrides working_dir resolution.
+        try:
+            st = os.stat(config_path)
+            cache_key = (os.path.abspath(config_path), st.st_size, st.st_mtime_ns,
+                         os.environ.get("DATA_DIR"))
+        except OSError:
+            cache_key = None
+        if cache_key is not None:
+            cached = _CONFIG_CACHE.get(cache_key)
+            if cached is not None:
+                return copy.deepcopy(cached)
+
         config_path_lower = config_path.lower()
         if config_path_lower.endswith('.yaml') or config_path_lower.endswith('.yml'):
-            return cls.from_yaml(config_path)
+            config = cls.from_yaml(config_path)
         else:
-            return cls.from_json(config_path)
+            config = cls.from_json(config_path)
+
+        if cache_key is not None:
+            _CONFIG_CACHE[cache_key] = copy.deepcopy(config)
+        return config
@@ -1,10 +1,18 @@
 from abc import ABC, abstractmethod
 from pathlib import Path
-from datetime import datetime
 from typing import Optional
+import functools
+import os
 import shutil
+import time
 from .config import TaskConfig
 
+# Image extensions accepted by ODM (matched case-insensitively).
+# Kept as bytes: the input scan runs on fsencoded paths so DirEntry names
+# never round-trip through UTF-8 decoding.
+_IMAGE_EXTENSIONS = frozenset({b".jpg", b".jpeg", b".tif", b".tiff"})
+
+
 class ReconstructionContext:
     """
     Context object passed between strategies.
@@ -12,7 +20,6 @@ class ReconstructionContext:
     Each run creates a timestamped directory under runs/ to avoid conflicts.
     """
     def __init__(self, config: TaskConfig, config_file_path: str = None):
-        import os
         self.config = config
         
         # Check for RESUME_ID environment variable
@@ -25,8 +32,13 @@ class ReconstructionContext:
                 raise ValueError(f"Resume ID {resume_id} specified, but directory {self.run_dir} does not exist.")
             print(f"[Pipeline] Resuming from existing directory: {self.run_dir}")
         else:
-            # Create timestamped run directory
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            # Create timestamped run directory. The name keeps the sortable
+            # date format (run listing / RESUME_ID rely on it) but appends
+            # milliseconds so parameter sweeps spawning several runs within
+            # one second never collide.
+            now = time.time()
+            timestamp = time.strftime("%Y%m%d_%H%M%S", time.localtime(now))
+            timestamp = f"{timestamp}_{int(now * 1000) % 1000:03d}"
             self.run_dir: Path = Path(config.working_dir) / "runs" / timestamp
             print(f"[Pipeline] Creating new run directory: {self.run_dir}")
         
@@ -38,19 +50,19 @@ class ReconstructionContext:
         self.log_path: Path = self.run_dir / "logs"
         self.metrics: dict = {}  # Store quality metrics from different stages
         
-        # Execution Statistics
-        self.start_time: Optional[datetime] = None
-        self.end_time: Optional[datetime] = None
+        # Execution Statistics (epoch-second floats, set by the pipeline)
+        self.start_time: Optional[float] = None
+        self.end_time: Optional[float] = None
         self.total_duration: Optional[float] = None # in seconds
         
-        # Photo count
-        self.photo_count: int = 0
-        self._count_photos(config.input_images_dir)
-        
+        # Photo count is computed lazily (photo_count cached property)
+
         # Create only essential directories (log_path for our logs)
-        # ODM/OpenSplat will auto-create their output directories
-        self.run_dir.mkdir(parents=True, exist_ok=True)
-        self.log_path.mkdir(parents=True, exist_ok=True)
+        # ODM/OpenSplat will auto-create their output directories.
+        # log_path lives under run_dir, so one makedirs covers both; the
+        # isdir check skips the syscall entirely on resumed runs.
+        if not os.path.isdir(self.log_path):
+            os.makedirs(self.log_path, exist_ok=True)
         
         # Copy config file to run directory for reproducibility
         # Only copy if creating new or if explicit overwrite logic (here we always copy/overwrite to ensure latest config is used)
@@ -58,16 +70,85 @@ class ReconstructionContext:
             src_config = Path(config_file_path)
             if src_config.exists():
                 dest_config = self.run_dir / src_config.name
-                shutil.copy2(src_config, dest_config)
+                self._snapshot_config(src_config, dest_config)
                 print(f"[Pipeline] Config saved: {dest_config}")
 
-    def _count_photos(self, images_dir: str):
-        """Count actual image files in input directory."""
-        path = Path(images_dir)
-        if path.exists():
-            # ODM supports JPG, TIFF
-            extensions = [".jpg", ".jpeg", ".JPG", ".JPEG", ".tif", ".tiff", ".TIF", ".TIFF"]
-            self.photo_count = len([f for f in path.glob("*") if f.suffix in extensions])
+    @staticmethod
+    def _snapshot_config(src_config: Path, dest_config: Path):
+        """
+        Snapshot the config into the run directory.
+        A hardlink is O(1) on the common same-filesystem case; full copy is
+        the cross-device fallback. The destination is removed first so a
+        resumed run always snapshots the latest config.
+        """
+        # Resume fast path: skip entirely when the existing snapshot is
+        # already the same file (hardlink) or matches on size+mtime
+        try:
+            src_st = os.stat(src_config)
+            dst_st = os.stat(dest_config)
+            if (dst_st.st_ino, dst_st.st_dev) == (src_st.st_ino, src_st.st_dev) or (
+                dst_st.st_size == src_st.st_size
+                and abs(dst_st.st_mtime - src_st.st_mtime) < 1
+            ):
+                return
+        except OSError:
+            pass
+        try:
+            dest_config.unlink()
+        except OSError:
+            pass
+        try:
+            os.link(src_config, dest_config)
+        except OSError:
+            shutil.copy2(src_config, dest_config)
+
+    @functools.cached_property
+    def rel_run_path(self) -> Path:
+        """Run directory path relative to the project working_dir."""
+        return self.run_dir.relative_to(self.config.working_dir)
+
+    @functools.cached_property
+    def host_run_dir(self) -> Path:
+        """
+        Host-side equivalent of run_dir, reconstructed for DooD mounts.
+        Raises ValueError when HOST_DATA_DIR is not configured.
+        """
+        return self._host_data_dir() / self.rel_run_path
+
+    @functools.cached_property
+    def host_images_dir(self) -> Path:
+        """Host-side equivalent of the input images directory (DooD)."""
+        rel_images = Path(self.config.input_images_dir).relative_to(self.config.working_dir)
+        return self._host_data_dir() / rel_images
+
+    @staticmethod
+    def _host_data_dir() -> Path:
+        host_data_dir = os.environ.get("HOST_DATA_DIR")
+        if not host_data_dir:
+            raise ValueError("HOST_DATA_DIR environment variable is missing. Required for DooD.")
+        return Path(host_data_dir)
+
+    @functools.cached_property
+    def photo_count(self) -> int:
+        """
+        Number of image files in the input directory.
+        Computed on first access so pipelines that only run downstream steps
+        never pay for the directory scan (can be seconds on NFS).
+        """
+        # scandir over a bytes path avoids allocating a Path per entry and
+        # skips the UTF-8 decode of every filename (drone datasets can hold
+        # 10k+ images); suffix membership is one frozenset lookup
+        count = 0
+        try:
+            with os.scandir(os.fsencode(self.config.input_images_dir)) as it:
+                for entry in it:
+                    name = entry.name
+                    dot = name.rfind(b".")
+                    if dot >= 0 and name[dot:].lower() in _IMAGE_EXTENSIONS:
+                        count += 1
+        except OSError:
+            pass
+        return count
 
 class PipelineStep(ABC):
     """
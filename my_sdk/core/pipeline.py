@@ -1,31 +1,57 @@
-from typing import Dict, Type
+import functools
+import importlib
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Dict
 from my_sdk.core.interfaces import SfMStrategy, ReconstructionStrategy, ReconstructionContext
 from my_sdk.core.config import TaskConfig
+from my_sdk.core.report_engine import ReportEngine
+from my_sdk.utils.docker_runner import DockerRunner
 
-# Adapter Registry
-from my_sdk.adapters.opensfm import OpenSfMAdapter
-from my_sdk.adapters.opensplat import OpenSplatAdapter
-from my_sdk.adapters.gs_to_pc import GSToPCAdapter
+logger = logging.getLogger("my_sdk")
 
 class PipelineFactory:
-    _sfm_registry: Dict[str, Type[SfMStrategy]] = {
-        "opensfm": OpenSfMAdapter
+    # Adapter Registry: "module:Class" specs, imported on first use so that
+    # importing this module (CLI --help, web server startup) does not pay the
+    # transitive adapter imports for stages the config never enables.
+    _sfm_registry: Dict[str, str] = {
+        "opensfm": "my_sdk.adapters.opensfm:OpenSfMAdapter"
     }
-    _recon_registry: Dict[str, Type[ReconstructionStrategy]] = {
-        "opensplat": OpenSplatAdapter
+    _recon_registry: Dict[str, str] = {
+        "opensplat": "my_sdk.adapters.opensplat:OpenSplatAdapter"
     }
-    
+    _gs_to_pc_spec = "my_sdk.adapters.gs_to_pc:GSToPCAdapter"
+    # Adapters are stateless (all run state lives on the context), so one
+    # instance per name is shared across pipelines instead of re-instantiated
+    # for every pipeline a server or sweep spins up.
+    _instances: Dict[str, object] = {}
+
+    @classmethod
+    def _get_instance(cls, name: str, spec: str):
+        instance = cls._instances.get(name)
+        if instance is None:
+            module_name, _, class_name = spec.partition(":")
+            adapter_cls = getattr(importlib.import_module(module_name), class_name)
+            instance = cls._instances[name] = adapter_cls()
+        return instance
+
     @classmethod
     def create_sfm(cls, name: str) -> SfMStrategy:
         if name not in cls._sfm_registry:
              raise ValueError(f"Unknown SfM algorithm: {name}")
-        return cls._sfm_registry[name]()
+        return cls._get_instance(name, cls._sfm_registry[name])
 
     @classmethod
     def create_reconstruction(cls, name: str) -> ReconstructionStrategy:
         if name not in cls._recon_registry:
              raise ValueError(f"Unknown Reconstruction algorithm: {name}")
-        return cls._recon_registry[name]()
+        return cls._get_instance(name, cls._recon_registry[name])
+
+    @classmethod
+    def create_gs_to_pc(cls):
+        return cls._get_instance("gs_to_pc", cls._gs_to_pc_spec)
 
 class ReconstructionPipeline:
     # Step type constants for stages API
@@ -33,11 +59,25 @@ class ReconstructionPipeline:
     STEP_MESH = "mesh"
     STEP_RECONSTRUCTION = "reconstruction"
     STEP_GS_TO_PC = "gs_to_pc"
-    
+
+    # Stage dependency DAG: a stage runs once all its prerequisites that are
+    # part of the current run have finished. Stages with no unmet
+    # prerequisites run concurrently.
+    _DEPENDENCIES = {
+        STEP_SFM: (),
+        STEP_MESH: (STEP_SFM,),
+        STEP_RECONSTRUCTION: (STEP_SFM,),
+        STEP_GS_TO_PC: (STEP_RECONSTRUCTION,),
+    }
+
+    # Every stage name the stages API accepts
+    _KNOWN_STAGES = frozenset({STEP_SFM, STEP_MESH, STEP_RECONSTRUCTION, STEP_GS_TO_PC})
+
     def __init__(self, config: TaskConfig, config_file_path: str = None):
         self.config = config
         self.context = ReconstructionContext(config, config_file_path)
         self.steps = {}  # Changed to dict for named access
+        self._metrics_lock = threading.Lock()  # stage threads share context.metrics
         
         # --- Dependency Validation ---
         self._validate_dependencies()
@@ -59,7 +99,7 @@ class ReconstructionPipeline:
 
         # 4. GS to Point Cloud Step
         if config.run_gs_to_pc:
-            self.steps[self.STEP_GS_TO_PC] = GSToPCAdapter()
+            self.steps[self.STEP_GS_TO_PC] = PipelineFactory.create_gs_to_pc()
     
     def _validate_dependencies(self):
         """
@@ -67,23 +107,35 @@ class ReconstructionPipeline:
         Raises ValueError if dependencies are not satisfied.
         """
         config = self.config
-        
+        self._validate_flags(
+            config.run_sparse, config.run_mesh, config.run_gaussian, config.run_gs_to_pc
+        )
+
+    @staticmethod
+    @functools.lru_cache(maxsize=32)
+    def _validate_flags(run_sparse: bool, run_mesh: bool, run_gaussian: bool, run_gs_to_pc: bool):
+        """
+        Flag-combination validation, memoized: servers and sweeps build many
+        pipelines from the same flags, and only the four booleans matter.
+        (lru_cache does not cache raised exceptions, so invalid combinations
+        keep raising on every call.)
+        """
         # Gaussian Splatting requires SfM/Sparse reconstruction
-        if config.run_gaussian and not (config.run_sparse):
+        if run_gaussian and not (run_sparse):
             raise ValueError(
                 "Gaussian Splatting requires sparse reconstruction. "
                 "Please set 'run_sparse' to true."
             )
         
         # Mesh reconstruction typically requires sparse reconstruction too
-        if config.run_mesh and not (config.run_sparse):
+        if run_mesh and not (run_sparse):
             raise ValueError(
                 "Mesh reconstruction requires sparse reconstruction. "
                 "Please set 'run_sparse' to true."
             )
-            
+
         # GS to PC requires either a Gaussian model or running the Gaussian step
-        if config.run_gs_to_pc and not (config.run_gaussian):
+        if run_gs_to_pc and not (run_gaussian):
             # Check if there's already a splat.ply we can use (resume case)
             # However, we'll enforce the logic for simplicity that the pipeline knows how to chain
             # We'll rely on GSToPCAdapter's internal check for the actual file
@@ -100,68 +152,126 @@ class ReconstructionPipeline:
         Returns:
             bool: True if all requested stages completed successfully.
         """
-        # Determine which steps to run
+        # Determine which steps to run (set/comprehension filters instead of
+        # per-stage if/elif chains; _KNOWN_STAGES now also covers gs_to_pc,
+        # which the old literal list forgot)
         if stages is None:
             steps_to_run = list(self.steps.items())
         else:
-            steps_to_run = []
+            unknown = [s for s in stages if s not in self._KNOWN_STAGES]
+            if unknown:
+                raise ValueError(f"Unknown stage: {unknown[0]}")
             for stage_name in stages:
                 if stage_name not in self.steps:
-                    if stage_name in [self.STEP_SFM, self.STEP_MESH, self.STEP_RECONSTRUCTION]:
-                        print(f"Warning: Stage '{stage_name}' not configured, skipping.")
-                    else:
-                        raise ValueError(f"Unknown stage: {stage_name}")
-                else:
-                    steps_to_run.append((stage_name, self.steps[stage_name]))
+                    print(f"Warning: Stage '{stage_name}' not configured, skipping.")
+            steps_to_run = [(s, self.steps[s]) for s in stages if s in self.steps]
         
         if not steps_to_run:
             print("Warning: No stages to run.")
             return True
         
+        # Warm the GPU probe in the background: the result is memoized inside
+        # DockerRunner, so every adapter hits the cache instead of paying the
+        # multi-second docker probe on the critical path. One thread suffices
+        # since all stages share the single cached probe.
+        threading.Thread(target=DockerRunner.check_gpu_support, daemon=True).start()
+
         print("=== Starting 3D Reconstruction Pipeline ===")
-        print(f"[PIPELINE_START] stages={','.join([name for name, _ in steps_to_run])}")
+        # Machine-readable markers go through logging with lazy %-formatting:
+        # the strings are only built if a handler actually emits them
+        logger.info("[PIPELINE_START] stages=%s", ",".join([name for name, _ in steps_to_run]))
         print(f"Plan: {[step.name for _, step in steps_to_run]}")
-        
-        from datetime import datetime
-        self.context.start_time = datetime.now()
-        
+
+        # Wall-clock timestamps are plain floats (time.time()); durations use
+        # the monotonic perf counter - no datetime/timedelta churn per stage.
+        self.context.start_time = time.time()
+        run_perf_start = time.perf_counter()
+
+        # Dependency-aware scheduler: submit every stage whose prerequisites
+        # (restricted to the selected set) are done, then wait for the first
+        # completion and repeat. Sequential configs behave exactly as before;
+        # independent stages (e.g. mesh alongside splat training) overlap.
+        selected = {name for name, _ in steps_to_run}
+        pending = dict(steps_to_run)
+        done = set()
+        running = {}  # Future -> stage_name
         all_success = True
-        for stage_name, step in steps_to_run:
-            print(f"[STAGE_START] {stage_name} - {step.name}")
-            print(f"--- Stage: {step.name} ---")
-            stage_start = datetime.now()
-            
-            success = step.run(self.context)
-            
-            stage_end = datetime.now()
-            duration = (stage_end - stage_start).total_seconds()
-            
-            # Store duration in metrics
-            if stage_name not in self.context.metrics:
-                self.context.metrics[stage_name] = {}
-            self.context.metrics[stage_name]["duration_seconds"] = duration
-
-            print(f"[STAGE_END] {stage_name} - {step.name} success={success} duration_sec={duration:.2f}")
-            if not success:
-                print(f"Pipeline aborted at step: {step.name}")
-                all_success = False
-                break
-            
-        self.context.end_time = datetime.now()
-        self.context.total_duration = (self.context.end_time - self.context.start_time).total_seconds()
+
+        with ThreadPoolExecutor(max_workers=len(pending)) as executor:
+            while pending or running:
+                if all_success:
+                    ready = [
+                        name for name in pending
+                        if all(dep in done or dep not in selected
+                               for dep in self._DEPENDENCIES.get(name, ()))
+                    ]
+                    for name in ready:
+                        step = pending.pop(name)
+                        running[executor.submit(self._run_stage, name, step)] = name
+
+                if not running:
+                    break  # failure drained the queue, or deps are unsatisfiable
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    stage_name = running.pop(future)
+                    if future.result():
+                        done.add(stage_name)
+                    else:
+                        print(f"Pipeline aborted at step: {self.steps[stage_name].name}")
+                        all_success = False
+                        pending.clear()  # abort: stop scheduling new stages
+
+        self.context.end_time = time.time()
+        self.context.total_duration = time.perf_counter() - run_perf_start
         
         if all_success:
             print("=== Pipeline Completed Successfully ===")
-        print(f"[PIPELINE_END] success={all_success} total_duration_sec={self.context.total_duration:.2f}")
+        logger.info("[PIPELINE_END] success=%s total_duration_sec=%.2f",
+                    all_success, self.context.total_duration)
         
         self._generate_quality_report()
         return all_success
 
+    def _run_stage(self, stage_name, step) -> bool:
+        """Execute one stage (worker thread) and record its duration."""
+        logger.info("[STAGE_START] %s - %s", stage_name, step.name)
+        print(f"--- Stage: {step.name} ---")
+        stage_start = time.perf_counter()
+
+        success = step.run(self.context)
+
+        duration = time.perf_counter() - stage_start
+
+        # Store duration in metrics (stages may finish concurrently)
+        with self._metrics_lock:
+            self.context.metrics.setdefault(stage_name, {})["duration_seconds"] = duration
+
+        logger.info("[STAGE_END] %s - %s success=%s duration_sec=%.2f",
+                    stage_name, step.name, success, duration)
+        return success
+
     def _generate_quality_report(self):
-        """Invoke the report engine to produce Chinese quality metrics."""
-        from my_sdk.core.report_engine import ReportEngine
-        try:
-            engine = ReportEngine(self.context)
-            engine.generate()
-        except Exception as e:
-            print(f"Warning: Failed to generate quality report: {e}")
+        """
+        Kick off report generation on a background thread so callers are not
+        blocked on the report/metrics writes. Use wait_for_report() to join.
+        """
+        # Nothing ran (e.g. all stages skipped): no report to write
+        if not self.context.metrics:
+            return
+
+        def _generate():
+            try:
+                engine = ReportEngine(self.context)
+                engine.generate()
+            except Exception as e:
+                print(f"Warning: Failed to generate quality report: {e}")
+
+        self._report_thread = threading.Thread(target=_generate, name="report-engine")
+        self._report_thread.start()
+
+    def wait_for_report(self, timeout: float = None):
+        """Block until the background report generation (if any) finishes."""
+        thread = getattr(self, "_report_thread", None)
+        if thread is not None:
+            thread.join(timeout)
@@ -1,35 +1,85 @@
 import sys
 import argparse
+import queue
 import signal
+import threading
 from my_sdk.core.config import TaskConfig
 from my_sdk.core.pipeline import ReconstructionPipeline
 from my_sdk.utils.docker_runner import setup_logging
 
 
 class _TeeStream:
+    """
+    Fan writes out to several sinks without blocking the writer.
+    write() only enqueues; a daemon thread per sink drains its queue, so the
+    pipeline thread never waits on console/disk I/O (previously every write
+    paid a write+flush syscall pair per sink). flush() blocks until all
+    queued data has reached the sinks.
+    """
     def __init__(self, *streams):
         self.streams = streams
+        self._queues = []
+        for stream in streams:
+            q = queue.Queue()
+            # isatty is cached once: only terminal sinks get eager flushes,
+            # file sinks rely on their (64KB) buffer until flush() is called
+            try:
+                is_tty = stream.isatty()
+            except Exception:
+                is_tty = False
+            threading.Thread(target=self._drain, args=(q, stream, is_tty), daemon=True).start()
+            self._queues.append(q)
+
+    @staticmethod
+    def _drain(q, stream, is_tty):
+        while True:
+            data = q.get()
+            try:
+                stream.write(data)
+                if is_tty and q.empty():
+                    # Flush terminals only when caught up: keeps interactive
+                    # output live without one flush syscall per line
+                    stream.flush()
+            except Exception:
+                pass
+            finally:
+                q.task_done()
 
     def write(self, data):
-        for stream in self.streams:
-            stream.write(data)
-        for stream in self.streams:
-            stream.flush()
+        for q in self._queues:
+            q.put(data)
 
     def flush(self):
+        for q in self._queues:
+            q.join()
         for stream in self.streams:
-            stream.flush()
+            try:
+                stream.flush()
+            except Exception:
+                pass
 
     def isatty(self):
         return False
 
-def _signal_handler(sig, frame):
-    """Handle SIGTERM by raising KeyboardInterrupt to trigger cleanup in blocking calls."""
-    raise KeyboardInterrupt
+def _install_sigterm_handler():
+    """
+    SIGTERM handling (docker stop / kill).
+
+    The handler raises KeyboardInterrupt directly: during a run the main
+    thread is blocked in futures.wait() or a subprocess wait, and a raise
+    from the handler is what interrupts those calls immediately so the
+    cleanup paths (container termination in DockerRunner) run inside the
+    stop grace period. A deferred scheme (wakeup fd + interrupt_main) only
+    delivers at the next bytecode boundary and cannot wake a blocked C call.
+    """
+    def _handle_sigterm(sig, frame):
+        raise KeyboardInterrupt
+
+    signal.signal(signal.SIGTERM, _handle_sigterm)
 
 def main():
-    # Register signal handler for SIGTERM (e.g. docker stop or kill)
-    signal.signal(signal.SIGTERM, _signal_handler)
+    # Register signal handling for SIGTERM (e.g. docker stop or kill)
+    _install_sigterm_handler()
     
     parser = argparse.ArgumentParser(description="Custom 3D Reconstruction SDK")
     parser.add_argument("--config", required=True, help="Path to configuration file (JSON or YAML)")
@@ -51,13 +101,18 @@ def main():
 
         try:
             setup_logging(level=20, log_file=log_path, stream=orig_stderr)  # INFO level
-            log_file_handle = open(log_path, "a", encoding="utf-8")
+            log_file_handle = open(log_path, "a", encoding="utf-8", buffering=65536)
             sys.stdout = _TeeStream(orig_stdout, log_file_handle)
             sys.stderr = _TeeStream(orig_stderr, log_file_handle)
 
-            # 4. Run
+            # 4. Run (report generation finishes in the background)
             success = pipeline.run()
+            pipeline.wait_for_report()
         finally:
+            # Drain the tee queues before detaching/closing the sinks
+            for tee in (sys.stdout, sys.stderr):
+                if isinstance(tee, _TeeStream):
+                    tee.flush()
             sys.stdout = orig_stdout
             sys.stderr = orig_stderr
             if log_file_handle:
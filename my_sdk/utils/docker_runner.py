@@ -4,15 +4,65 @@ Docker Runner Utility
 Provides logging, progress tracking, and error handling for Docker container execution.
 """
 
+import json
+import os
 import subprocess
 import logging
 import re
+import time
 from pathlib import Path
 from typing import Optional, Callable, List
 from datetime import datetime
 
+try:
+    # Optional: the docker SDK lets exec_in reuse one unix-socket connection
+    # instead of forking the docker CLI for every step
+    import docker as _docker_sdk
+except ImportError:
+    _docker_sdk = None
+
 logger = logging.getLogger("my_sdk")
 
+# Per-line patterns, compiled once: the run() loop applies these to every
+# subprocess output line
+_ANSI_RE = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
+_PROGRESS_PCT_RE = re.compile(r'(\d+(?:\.\d+)?)\s*%')
+_PROGRESS_FRAC_RE = re.compile(r'(\d+)\s*(?:of|/)\s*(\d+)', re.IGNORECASE)
+
+# Process-level GPU probe cache. The probe spawns a container (multi-second
+# cold start), so repeated pipeline stages / resumes should never re-probe.
+_GPU_PROBE_RESULT: Optional[bool] = None
+_GPU_PROBE_CACHE_FILE = Path.home() / ".cache" / "my_sdk" / "gpu_probe.json"
+
+
+def _nvidia_driver_key() -> Optional[str]:
+    """Fingerprint of the host NVIDIA driver, used to invalidate the on-disk probe cache."""
+    try:
+        with open("/proc/driver/nvidia/version", "r") as f:
+            return f.readline().strip()
+    except OSError:
+        return None
+
+
+def _load_gpu_probe_cache() -> Optional[bool]:
+    try:
+        with open(_GPU_PROBE_CACHE_FILE, "r") as f:
+            cached = json.load(f)
+        if cached.get("driver") == _nvidia_driver_key():
+            return bool(cached.get("gpu_support"))
+    except Exception:
+        pass
+    return None
+
+
+def _save_gpu_probe_cache(result: bool):
+    try:
+        _GPU_PROBE_CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+        with open(_GPU_PROBE_CACHE_FILE, "w") as f:
+            json.dump({"driver": _nvidia_driver_key(), "gpu_support": result}, f)
+    except Exception:
+        pass  # Cache is best-effort; never fail the probe over it
+
 
 class DockerRunner:
     """
@@ -53,55 +103,93 @@ class DockerRunner:
             bool: True if command succeeded, False otherwise
         """
         logger.info(f"[{step_name}] Starting: {' '.join(command)}")
-        
-        # Create log file if log_dir is set
+
         # Create log file if log_dir is set
-        log_file_path = None
-        log_file_handle = None
-        
-        if self.log_dir:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            safe_name = re.sub(r'[^\w\-]', '_', step_name.lower())
-            log_file_path = self.log_dir / f"{safe_name}_{timestamp}.log"
-            
-            # Open file for real-time writing
-            try:
-                log_file_handle = open(log_file_path, 'w', encoding='utf-8')
-                log_file_handle.write(f"# Log started at {datetime.now().isoformat()}\n")
-                log_file_handle.write(f"# Command: {' '.join(command)}\n")
-                log_file_handle.write("# " + "=" * 50 + "\n\n")
-                logger.debug(f"[{step_name}] Logging to {log_file_path}")
-            except Exception as e:
-                logger.error(f"[{step_name}] Failed to open log file: {e}")
-        
-        logs: List[str] = []
+        log_file_handle = self._open_log_file(step_name, command)
+
         return_code = -1
+
+        # Console emission is batched: one logger record per ~64 lines (or
+        # every ~2s, whichever first) instead of a format-lock-dispatch cycle
+        # per line. Skipped entirely above INFO level.
+        emit_console = logger.isEnabledFor(logging.INFO)
+        console_buf: List[str] = []
+        last_emit = time.monotonic()
+
+        def _flush_console():
+            nonlocal last_emit
+            if console_buf:
+                logger.info("[%s] %s", step_name, "\n".join(console_buf))
+                console_buf.clear()
+            last_emit = time.monotonic()
         
         try:
+            # Binary pipe, unbuffered: the loop below pulls 64KB chunks
+            # straight from the pipe instead of paying a decode + iterator
+            # step per line (ANSI-heavy progress bars emit thousands/sec)
             process = subprocess.Popen(
                 command,
                 stdout=subprocess.PIPE,
                 stderr=subprocess.STDOUT,
-                text=True,
-                bufsize=1  # Line buffered
+                bufsize=0
             )
-            
-            for line in process.stdout:
-                line = line.rstrip('\n\r')
-                line = self._strip_ansi(line) # Remove ANSI color codes
-                logs.append(line)
-                
-                # Log to console
-                logger.info(f"[{step_name}] {line}")
-                
-                # Log to file real-time
+
+            lines_since_flush = 0
+            stdout_fd = process.stdout.fileno()
+            tail = b""  # partial line carried between chunks
+            while True:
+                chunk = os.read(stdout_fd, 65536)
+                if not chunk:
+                    break
+                data = tail + chunk
+                # Universal newlines, as the old text-mode iterator had:
+                # progress bars redraw with bare \r, so \r must terminate a
+                # line or the whole bar piles up in the tail. A chunk ending
+                # in \r is held back one round in case the \n follows.
+                if data.endswith(b"\r"):
+                    data, pending_cr = data[:-1], b"\r"
+                else:
+                    pending_cr = b""
+                data = data.replace(b"\r\n", b"\n").replace(b"\r", b"\n")
+                *raw_lines, tail = data.split(b"\n")
+                tail += pending_cr
+                for raw_line in raw_lines:
+                    line = raw_line.decode('utf-8', 'replace')
+                    line = self._strip_ansi(line) # Remove ANSI color codes
+                    # Log to console (batched)
+                    if emit_console:
+                        console_buf.append(line)
+                        if len(console_buf) >= 64 or time.monotonic() - last_emit >= 2.0:
+                            _flush_console()
+
+                    # Log to file: the handle is block-buffered binary (64KB),
+                    # so this is a memcpy, not a syscall per line
+                    if log_file_handle:
+                        log_file_handle.write(line.encode('utf-8', 'replace') + b'\n')
+                        lines_since_flush += 1
+
+                    # Try to extract progress
+                    progress = self._extract_progress(line)
+                    if progress is not None:
+                        if self.progress_callback:
+                            self.progress_callback(step_name, progress)
+                        # Progress marks a natural batch boundary: flush so
+                        # log tailers (web UI) see reasonably fresh data
+                        if lines_since_flush:
+                            log_file_handle.flush()
+                            lines_since_flush = 0
+                    elif lines_since_flush >= 256:
+                        log_file_handle.flush()
+                        lines_since_flush = 0
+
+            tail = tail.rstrip(b"\r")
+            if tail:
+                # Output that did not end in a newline (e.g. a final prompt)
+                line = self._strip_ansi(tail.decode('utf-8', 'replace'))
+                if emit_console:
+                    console_buf.append(line)
                 if log_file_handle:
-                    log_file_handle.write(line + "\n")
-                
-                # Try to extract progress
-                progress = self._extract_progress(line)
-                if progress is not None and self.progress_callback:
-                    self.progress_callback(step_name, progress)
+                    log_file_handle.write(line.encode('utf-8', 'replace') + b'\n')
             
             # Wait for process to complete
             return_code = process.wait(timeout=timeout)
@@ -135,19 +223,182 @@ class DockerRunner:
             return False
             
         finally:
+            _flush_console()
             if log_file_handle:
                 if return_code is not None:
-                     log_file_handle.write(f"\n# Exit code: {return_code}\n")
-                     log_file_handle.write(f"# Finished at {datetime.now().isoformat()}\n")
+                     footer = (f"\n# Exit code: {return_code}\n"
+                               f"# Finished at {datetime.now().isoformat()}\n")
+                     log_file_handle.write(footer.encode('utf-8'))
+                log_file_handle.close()
+
+    def _open_log_file(self, step_name: str, command: List[str]):
+        """Open a per-step log file for real-time writing (None if no log_dir)."""
+        if not self.log_dir:
+            return None
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        safe_name = re.sub(r'[^\w\-]', '_', step_name.lower())
+        log_file_path = self.log_dir / f"{safe_name}_{timestamp}.log"
+        try:
+            # Binary block-buffered handle: per-line writes stay in the 64KB
+            # buffer instead of going through the text-IO stack + a syscall
+            log_file_handle = open(log_file_path, 'wb', buffering=1 << 16)
+            header = (
+                f"# Log started at {datetime.now().isoformat()}\n"
+                f"# Command: {' '.join(command)}\n"
+                "# " + "=" * 50 + "\n\n"
+            )
+            log_file_handle.write(header.encode('utf-8'))
+            logger.debug(f"[{step_name}] Logging to {log_file_path}")
+            return log_file_handle
+        except Exception as e:
+            logger.error(f"[{step_name}] Failed to open log file: {e}")
+            return None
+
+
+    def start_persistent(
+        self,
+        image: str,
+        mounts: List[str],
+        gpu: bool = False,
+        step_name: str = "Docker"
+    ) -> Optional[str]:
+        """
+        Start a long-lived helper container (sleep infinity) and return its id.
+        Commands are then dispatched with exec_in, so a pipeline pays the
+        container create/teardown cost once instead of per step.
+        Returns None when the container cannot be started.
+        """
+        command = ["docker", "run", "-d", "--rm"]
+        if gpu:
+            command.extend(["--gpus", "all"])
+        command.extend(mounts)
+        command.extend([image, "sleep", "infinity"])
+        try:
+            result = subprocess.run(
+                command,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True,
+                timeout=120
+            )
+        except Exception as e:
+            logger.warning(f"[{step_name}] Could not start persistent container: {e}")
+            return None
+        if result.returncode != 0:
+            logger.warning(f"[{step_name}] Could not start persistent container: {result.stderr.strip()}")
+            return None
+        return result.stdout.strip()
+
+    # Shared docker SDK client (lazy). False marks a failed connection so we
+    # do not retry it on every exec.
+    _sdk_client = None
+
+    @classmethod
+    def _get_sdk_client(cls):
+        if _docker_sdk is None:
+            return None
+        if cls._sdk_client is None:
+            try:
+                cls._sdk_client = _docker_sdk.from_env()
+            except Exception:
+                cls._sdk_client = False
+        return cls._sdk_client or None
+
+    def exec_in(
+        self,
+        container_id: str,
+        command: List[str],
+        step_name: str = "Docker",
+        timeout: Optional[int] = None
+    ) -> bool:
+        """
+        Run a command inside a persistent container.
+        Uses the docker SDK's exec API when the 'docker' package is installed
+        (one persistent unix-socket connection, no CLI fork per step);
+        otherwise falls back to subprocess 'docker exec'.
+        """
+        client = self._get_sdk_client()
+        if client is not None:
+            return self._exec_via_sdk(client, container_id, command, step_name)
+        return self.run(["docker", "exec", container_id] + command, step_name=step_name, timeout=timeout)
+
+    def _exec_via_sdk(self, client, container_id: str, command: List[str], step_name: str) -> bool:
+        """Exec through the docker SDK, streaming output into the usual log path."""
+        logger.info(f"[{step_name}] Starting (SDK exec): {' '.join(command)}")
+        log_file_handle = self._open_log_file(step_name, command)
+        try:
+            exec_id = client.api.exec_create(container_id, cmd=command)["Id"]
+            stream = client.api.exec_start(exec_id, stream=True)
+
+            buffer = b""
+            for chunk in stream:
+                buffer += chunk
+                *raw_lines, buffer = buffer.split(b"\n")
+                for raw in raw_lines:
+                    line = self._strip_ansi(raw.decode('utf-8', 'replace').rstrip('\r'))
+                    logger.info(f"[{step_name}] {line}")
+                    if log_file_handle:
+                        log_file_handle.write(line.encode('utf-8', 'replace') + b'\n')
+                    progress = self._extract_progress(line)
+                    if progress is not None and self.progress_callback:
+                        self.progress_callback(step_name, progress)
+
+            exit_code = client.api.exec_inspect(exec_id).get("ExitCode")
+            if exit_code != 0:
+                logger.error(f"[{step_name}] Failed with exit code {exit_code}")
+                return False
+            logger.info(f"[{step_name}] Completed successfully")
+            return True
+        except Exception as e:
+            logger.error(f"[{step_name}] SDK exec error: {e}")
+            return False
+        finally:
+            if log_file_handle:
                 log_file_handle.close()
 
-    
+    @staticmethod
+    def stop_persistent(container_id: str):
+        """Force-remove a persistent helper container (ignores failures)."""
+        try:
+            subprocess.run(
+                ["docker", "rm", "-f", container_id],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                timeout=60
+            )
+        except Exception:
+            pass
+
     @staticmethod
     def check_gpu_support() -> bool:
         """
         Check if docker supports --gpus all by running a minimal command with alpine.
+        The result is memoized for the process lifetime and persisted to
+        ~/.cache/my_sdk/gpu_probe.json (keyed by NVIDIA driver version) so
+        subsequent stages and resumed runs skip the container cold-start.
+        Set FORCE_GPU=1/0 to bypass the probe entirely.
         """
-        import subprocess
+        forced = os.environ.get("FORCE_GPU")
+        if forced in ("0", "1"):
+            return forced == "1"
+
+        global _GPU_PROBE_RESULT
+        if _GPU_PROBE_RESULT is not None:
+            return _GPU_PROBE_RESULT
+
+        cached = _load_gpu_probe_cache()
+        if cached is not None:
+            _GPU_PROBE_RESULT = cached
+            return cached
+
+        result = DockerRunner._probe_gpu_support()
+        _GPU_PROBE_RESULT = result
+        _save_gpu_probe_cache(result)
+        return result
+
+    @staticmethod
+    def _probe_gpu_support() -> bool:
+        """Run the actual docker probe (slow path, cache miss only)."""
         try:
             # Use alpine for a fast, lightweight probe. 
             # If alpine is missing, it will pull it (very fast).
@@ -169,30 +420,63 @@ class DockerRunner:
             except:
                 return False
 
-    def _extract_progress(self, line: str) -> Optional[float]:
+    @staticmethod
+    def _extract_progress(line: str) -> Optional[float]:
         """
         Extract progress percentage from log line.
         Supports common patterns like "50%", "50/100", "[=====>    ] 50%"
         """
+        # C-level containment checks gate the regexes: most lines carry no
+        # progress marker at all, so the common case is a few `in` tests
         # Pattern 1: Direct percentage (e.g., "50%", "Progress: 75.5%")
-        match = re.search(r'(\d+(?:\.\d+)?)\s*%', line)
-        if match:
-            return float(match.group(1))
-        
+        if '%' in line:
+            match = _PROGRESS_PCT_RE.search(line)
+            if match:
+                return float(match.group(1))
+
         # Pattern 2: Fraction (e.g., "50/100", "Processing 25 of 50")
-        match = re.search(r'(\d+)\s*(?:of|/)\s*(\d+)', line, re.IGNORECASE)
-        if match:
-            current, total = int(match.group(1)), int(match.group(2))
-            if total > 0:
-                return (current / total) * 100
-        
+        if '/' in line or ' of ' in line or ' OF ' in line or ' Of ' in line:
+            match = _PROGRESS_FRAC_RE.search(line)
+            if match:
+                current, total = int(match.group(1)), int(match.group(2))
+                if total > 0:
+                    return (current / total) * 100
+
         return None
-    
+
     @staticmethod
     def _strip_ansi(text: str) -> str:
         """Remove ANSI escape sequences (colors, etc.) from string."""
-        ansi_escape = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
-        return ansi_escape.sub('', text)
+        # Fast path: docker/ODM output is almost entirely plain text, and a
+        # C-level containment check beats any per-character scan
+        if '\x1B' not in text:
+            if '\x9B' in text:
+                return _ANSI_RE.sub('', text)
+            return text
+        # Substring-copy loop: find each ESC, memcpy the clean run before it,
+        # then skip the CSI body up to its final byte (0x40-0x7E). This avoids
+        # the regex engine entirely for the overwhelmingly common `ESC [ ... m`
+        # color codes; the rare non-CSI escapes fall back to the regex.
+        parts = []
+        length = len(text)
+        start = 0
+        while True:
+            i = text.find('\x1b', start)
+            if i < 0:
+                parts.append(text[start:])
+                break
+            parts.append(text[start:i])
+            if text[i + 1:i + 2] == '[':
+                j = i + 2
+                while j < length and not '\x40' <= text[j] <= '\x7e':
+                    j += 1
+                start = j + 1
+            else:
+                # Non-CSI escape (OSC, charset shifts, ...): too varied to
+                # hand-parse, let the full regex clean the remainder
+                parts.append(_ANSI_RE.sub('', text[i:]))
+                break
+        return ''.join(parts)
 
     def _save_logs(self, log_file: Path, logs: List[str], return_code: int):
         """Save logs to file with metadata."""
@@ -3,78 +3,122 @@ import numpy as np
 from pathlib import Path
 from typing import Dict, Any
 
-def cv_to_nerf(rotation_vec, translation_vec):
+try:
+    # Optional: C parser, 2-5x faster on the multi-hundred-MB
+    # reconstruction.json files dense runs produce
+    import orjson
+except ImportError:
+    orjson = None
+
+# OpenCV -> OpenGL/NeRF axis flip (X right, Y down->up, Z forward->backward).
+# Kept at module scope for callers that need the explicit matrix; the batch
+# conversion applies it as a column negation instead of a matmul.
+_FLIP = np.diag([1.0, -1.0, -1.0, 1.0])
+
+def _rodrigues_batch(rvecs: np.ndarray) -> np.ndarray:
+    """
+    Axis-angle vectors (N,3) -> rotation matrices (N,3,3), vectorized.
+    Rodrigues' formula: R = I + sin(theta)*K + (1-cos(theta))*K@K where K is
+    the skew-symmetric matrix of the unit axis. Replaces per-shot
+    cv2.Rodrigues calls (and the cv2 dependency) with a few array ops.
+    """
+    theta = np.linalg.norm(rvecs, axis=1, keepdims=True)
+    # Zero rotation: the axis is arbitrary and both trig factors vanish,
+    # so dividing by 1 instead of 0 yields the identity as expected
+    axis = rvecs / np.where(theta > 0, theta, 1.0)
+    x, y, z = axis[:, 0], axis[:, 1], axis[:, 2]
+    zeros = np.zeros_like(x)
+    K = np.stack(
+        [zeros, -z, y,
+         z, zeros, -x,
+         -y, x, zeros], axis=1
+    ).reshape(-1, 3, 3)
+    theta = theta[:, :, None]  # (N,1,1) so the trig terms broadcast
+    return np.eye(3) + np.sin(theta) * K + (1.0 - np.cos(theta)) * (K @ K)
+
+def _cv_to_nerf_batch(rvecs, tvecs) -> np.ndarray:
     """
-    Convert OpenSfM (OpenCV-like) rotation/translation to NeRF (OpenGL-like) 4x4 matrix.
-    OpenSfM uses axis-angle and T = -R * C.
-    NeRF uses C2W 4x4 matrix.
+    Convert N OpenSfM (OpenCV-like) poses to NeRF (OpenGL-like) 4x4 matrices.
+    OpenSfM uses axis-angle and T = -R * C; NeRF uses C2W 4x4 matrices.
+    Takes (N,3) rotation and translation arrays, returns (N,4,4).
     """
-    import cv2
-    
-    # Axis-angle to rotation matrix
-    R, _ = cv2.Rodrigues(np.array(rotation_vec))
-    t = np.array(translation_vec).reshape(3, 1)
-    
+    R = _rodrigues_batch(np.asarray(rvecs, dtype=np.float64))
+    t = np.asarray(tvecs, dtype=np.float64)
+
     # OpenSfM camera pose is: P = [R | t]
     # Camera center in world space: C = -R^T * t
-    C = -R.T @ t
-    
+    Rt = R.transpose(0, 2, 1)
+    C = -np.einsum("nij,nj->ni", Rt, t)
+
     # C2W is: [R^T | -R^T * t]
-    # But NeRF uses -Y, -Z convention compared to OpenCV
-    # OpenCV: X right, Y down, Z forward
-    # OpenGL/NeRF: X right, Y up, Z backward
-    flip_mat = np.array([
-        [1, 0, 0, 0],
-        [0, -1, 0, 0],
-        [0, 0, -1, 0],
-        [0, 0, 0, 1]
-    ])
-    
-    c2w = np.eye(4)
-    c2w[:3, :3] = R.T
-    c2w[:3, 3] = C.flatten()
-    
-    # Apply flip to convert OpenCV to OpenGL/NeRF convention
+    c2w = np.broadcast_to(np.eye(4), (len(R), 4, 4)).copy()
+    c2w[:, :3, :3] = Rt
+    c2w[:, :3, 3] = C
+
+    # But NeRF uses -Y, -Z convention compared to OpenCV.
     # Note: Depending on the specific tool, this flip might be needed or handled internally.
     # 3dgs-to-pc uses diff-gaussian-rasterization which follows specific conventions.
-    return (c2w @ flip_mat).tolist()
+    # Right-multiplying by _FLIP (diag 1,-1,-1,1) just negates columns 1 and
+    # 2, so do that in place instead of a batched matmul.
+    c2w[:, :, 1] *= -1
+    c2w[:, :, 2] *= -1
+    return c2w
 
-def convert_opensfm_to_nerf(reconstruction_path: Path, output_json: Path, images_relative_path: str = "../../images"):
+def cv_to_nerf(rotation_vec, translation_vec):
+    """
+    Convert a single OpenSfM rotation/translation to a NeRF 4x4 matrix (as
+    nested lists). Thin N=1 wrapper around the batched conversion.
+    """
+    return _cv_to_nerf_batch([rotation_vec], [translation_vec])[0].tolist()
+
+def convert_opensfm_to_nerf(reconstruction_path: Path, output_json: Path, images_relative_path: str = "../../images", reconstructions=None):
     """
     Read SfM reconstruction and write transforms.json (NerfStudio/Instant-NGP format).
+    Pass `reconstructions` (the already-parsed JSON list) to skip re-reading the file
+    when the caller has parsed it for other purposes.
     """
-    with open(reconstruction_path, "r") as f:
-        reconstructions = json.load(f)
-    
+    if reconstructions is None:
+        raw = Path(reconstruction_path).read_bytes()
+        reconstructions = orjson.loads(raw) if orjson else json.loads(raw)
+
     if not reconstructions:
         return False
-        
+
     recon = reconstructions[0]
     nerf_data = {
         "camera_model": "OPENCV",
         "frames": []
     }
-    
+
     cameras = recon.get("cameras", {})
     shots = recon.get("shots", {})
-    
-    for shot_id, shot in shots.items():
+
+    # All poses are converted in one vectorized pass; the per-shot loop below
+    # only assembles the JSON dicts
+    shot_items = list(shots.items())
+    if shot_items:
+        matrices = _cv_to_nerf_batch(
+            [shot.get("rotation") for _, shot in shot_items],
+            [shot.get("translation") for _, shot in shot_items],
+        )
+
+    for (shot_id, shot), c2w in zip(shot_items, matrices) if shot_items else ():
         camera_id = shot.get("camera")
         camera = cameras.get(camera_id, {})
-        
+
         # OpenSfM normalization: focal = focal_val * max(width, height)
         # But commonly it's normalized by width in some contexts.
         # Actually in reconstruction.json, focal is often normalized.
         width = camera.get("width", 1)
         height = camera.get("height", 1)
         focal = camera.get("focal", 0.8) # Normalized focal
-        
+
         fl_x = focal * max(width, height)
         fl_y = fl_x
-        
+
         frame = {
             "file_path": f"{images_relative_path}/{shot_id}",
-            "transform_matrix": cv_to_nerf(shot.get("rotation"), shot.get("translation")),
+            "transform_matrix": c2w.tolist(),
             "fl_x": fl_x,
             "fl_y": fl_y,
             "w": width,
@@ -83,7 +127,7 @@ def convert_opensfm_to_nerf(reconstruction_path: Path, output_json: Path, images
             "cy": height / 2
         }
         nerf_data["frames"].append(frame)
-        
+
     # Global camera params if uniform
     if cameras:
         cam_0 = list(cameras.values())[0]
@@ -92,7 +136,10 @@ def convert_opensfm_to_nerf(reconstruction_path: Path, output_json: Path, images
         nerf_data["w"] = cam_0.get("width")
         nerf_data["h"] = cam_0.get("height")
 
-    with open(output_json, "w") as f:
-        json.dump(nerf_data, f, indent=4)
-        
+    if orjson:
+        payload = orjson.dumps(nerf_data, option=orjson.OPT_INDENT_2)
+    else:
+        payload = json.dumps(nerf_data, indent=4).encode("utf-8")
+    Path(output_json).write_bytes(payload)
+
     return True
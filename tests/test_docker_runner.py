@@ -0,0 +1,45 @@
+"""Smoke tests for DockerRunner paths that do not need a docker daemon."""
+
+import unittest
+
+from my_sdk.utils.docker_runner import DockerRunner
+
+
+class _StubAPI:
+    """Minimal stand-in for docker.APIClient's exec endpoints."""
+
+    def __init__(self, chunks, exit_code=0):
+        self._chunks = chunks
+        self._exit_code = exit_code
+
+    def exec_create(self, container_id, cmd):
+        return {"Id": "stub-exec-id"}
+
+    def exec_start(self, exec_id, stream=True):
+        return iter(self._chunks)
+
+    def exec_inspect(self, exec_id):
+        return {"ExitCode": self._exit_code}
+
+
+class _StubClient:
+    def __init__(self, chunks, exit_code=0):
+        self.api = _StubAPI(chunks, exit_code)
+
+
+class ExecViaSdkTest(unittest.TestCase):
+    def test_success_streams_and_returns_true(self):
+        progress_calls = []
+        runner = DockerRunner(progress_callback=lambda step, pct: progress_calls.append(pct))
+        client = _StubClient([b"starting\n", b"step 1 of 2\nstep 2 ", b"of 2\ndone\n"])
+        self.assertTrue(runner._exec_via_sdk(client, "cid", ["opensplat"], "Test"))
+        self.assertEqual(progress_calls, [50.0, 100.0])
+
+    def test_nonzero_exit_code_returns_false(self):
+        runner = DockerRunner()
+        client = _StubClient([b"boom\n"], exit_code=2)
+        self.assertFalse(runner._exec_via_sdk(client, "cid", ["opensplat"], "Test"))
+
+
+if __name__ == "__main__":
+    unittest.main()
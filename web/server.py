@@ -1,14 +1,34 @@
+import asyncio
+import functools
+import io
 import json
 import os
 import signal
-import threading
+import subprocess
+import tempfile
+import time
+import zipfile
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, Optional
 
 import yaml
+try:
+    # libyaml parses 3-10x faster than the pure-Python SafeLoader
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
+try:
+    # Optional: C-level JSON for run.json metadata; list_runs parses every
+    # run's meta on each UI poll
+    import orjson
+    _dumps = lambda d: orjson.dumps(d, option=orjson.OPT_INDENT_2)
+    _loads = orjson.loads
+except ImportError:
+    _dumps = lambda d: json.dumps(d, indent=2).encode("utf-8")
+    _loads = json.loads
 from fastapi import FastAPI, HTTPException
-from fastapi.responses import FileResponse, HTMLResponse, PlainTextResponse
+from fastapi.responses import FileResponse, HTMLResponse, PlainTextResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 
@@ -74,7 +94,7 @@ class RunStartRequest(BaseModel):
     sdk_image: Optional[str] = None
 
 class RunProcess:
-    def __init__(self, run_id: str, process: 'subprocess.Popen', log_path: Path, run_dir: Path, meta_path: Path):
+    def __init__(self, run_id: str, process: 'asyncio.subprocess.Process', log_path: Path, run_dir: Path, meta_path: Path):
         self.run_id = run_id
         self.process = process
         self.log_path = log_path
@@ -97,7 +117,9 @@ class RunProcess:
         }
 
 RUNNING: Dict[str, RunProcess] = {}
-RUNNING_LOCK = threading.Lock()
+# All handlers touching RUNNING are coroutines on the event loop, so an
+# asyncio.Lock replaces the former thread lock
+RUNNING_LOCK = asyncio.Lock()
 
 app = FastAPI()
 
@@ -109,17 +131,37 @@ def index():
     return HTMLResponse(html_path.read_text(encoding="utf-8"))
 
 
+# Config file cache: the file only changes on PUT /api/config, but the UI
+# GETs it constantly. Keyed on st_mtime_ns; invalidated by _save_yaml_config.
+_CFG_CACHE: Optional[tuple] = None  # (st_mtime_ns, text, data)
+
+
 def _load_yaml_config() -> str:
     if not CONFIG_PATH.exists():
         return ""
     return CONFIG_PATH.read_text(encoding="utf-8")
 
 
+def _load_config_cached() -> tuple:
+    """Return (yaml_text, parsed_dict) for CONFIG_PATH, reparsing only on change."""
+    global _CFG_CACHE
+    try:
+        mtime_ns = CONFIG_PATH.stat().st_mtime_ns
+    except OSError:
+        return "", {}
+    if _CFG_CACHE is not None and _CFG_CACHE[0] == mtime_ns:
+        return _CFG_CACHE[1], _CFG_CACHE[2]
+    text = _load_yaml_config()
+    data = _parse_yaml(text)
+    _CFG_CACHE = (mtime_ns, text, data)
+    return text, data
+
+
 def _parse_yaml(text: str) -> dict:
     try:
         if text.strip() == "":
             return {}
-        data = yaml.safe_load(text) or {}
+        data = yaml.load(text, Loader=_YamlLoader) or {}
         if not isinstance(data, dict):
             raise ValueError("Root of YAML must be a mapping")
         return data
@@ -152,16 +194,21 @@ def _validate_config(data: dict, validate_mode: str) -> None:
 
 
 def _save_yaml_config(text: str) -> None:
+    global _CFG_CACHE
+    _CFG_CACHE = None
     CONFIG_PATH.parent.mkdir(parents=True, exist_ok=True)
     CONFIG_PATH.write_text(text, encoding="utf-8")
 
 
+# The defaults/template come from files shipped with the repo: read them once
+# per process instead of on every GET /api/config
+@functools.lru_cache(maxsize=1)
 def _load_default_data() -> dict:
     for path in (DEFAULT_CONFIG, SAMPLE_CONFIG):
         if path.exists():
             try:
                 text = path.read_text(encoding="utf-8")
-                data = yaml.safe_load(text) or {}
+                data = yaml.load(text, Loader=_YamlLoader) or {}
                 if isinstance(data, dict):
                     return data
             except Exception:
@@ -169,6 +216,7 @@ def _load_default_data() -> dict:
     return {}
 
 
+@functools.lru_cache(maxsize=1)
 def _load_template_yaml() -> str:
     if SAMPLE_CONFIG.exists():
         try:
@@ -195,8 +243,7 @@ def _ensure_config_exists() -> None:
 @app.get("/api/config")
 def get_config():
     _ensure_config_exists()
-    text = _load_yaml_config()
-    data = _parse_yaml(text)
+    text, data = _load_config_cached()
     host_config_path = _resolve_host_config_path()
     return {
         "path": str(host_config_path) if host_config_path else str(CONFIG_PATH),
@@ -227,21 +274,86 @@ def update_config(payload: ConfigUpdate):
     return {"ok": True}
 
 
+# Parsed run.json cache keyed by mtime: finished runs never change, so under
+# UI auto-refresh only metas that were actually rewritten get re-parsed
+_META_CACHE: Dict[Path, tuple] = {}  # path -> (st_mtime_ns, meta)
+
+# In-memory run index on top of the meta cache: RUNS_DIR is only re-listed
+# when its own mtime changes (i.e. a run directory appeared or disappeared,
+# e.g. via the CLI), so a steady-state poll never touches the disk for
+# finished runs
+_RUN_INDEX: Dict[str, dict] = {}
+_RUN_INDEX_MTIME: Optional[int] = None
+_TERMINAL_STATUSES = frozenset({"success", "failed"})
+
+
+def _unknown_meta(run_id: str) -> dict:
+    """Placeholder metadata for a run directory without a readable run.json."""
+    return {
+        "run_id": run_id,
+        "status": "unknown",
+        "started_at": None,
+        "ended_at": None,
+        "exit_code": None,
+        "log_path": str(RUNS_DIR / run_id / "logs" / "sdk.log"),
+        "config_path": str(CONFIG_PATH),
+    }
+
+
+def _refresh_run_index() -> None:
+    """Reconcile _RUN_INDEX with RUNS_DIR, but only when the directory changed."""
+    global _RUN_INDEX_MTIME
+    try:
+        mtime_ns = os.stat(RUNS_DIR).st_mtime_ns
+    except OSError:
+        _RUN_INDEX.clear()
+        _RUN_INDEX_MTIME = None
+        return
+    if mtime_ns == _RUN_INDEX_MTIME:
+        return
+    with os.scandir(RUNS_DIR) as it:
+        names = {e.name for e in it if e.is_dir()}
+    for name in list(_RUN_INDEX):
+        if name not in names:
+            _RUN_INDEX.pop(name)
+    for name in names:
+        if name not in _RUN_INDEX:
+            _RUN_INDEX[name] = _read_run_meta(RUNS_DIR / name / "run.json") or _unknown_meta(name)
+    _RUN_INDEX_MTIME = mtime_ns
+
+
 def _write_run_meta(meta_path: Path, meta: dict) -> None:
-    meta_path.write_text(json.dumps(meta, indent=2), encoding="utf-8")
+    _META_CACHE.pop(meta_path, None)
+    meta_path.write_bytes(_dumps(meta))
 
 
 def _read_run_meta(meta_path: Path) -> Optional[dict]:
-    if not meta_path.exists():
+    try:
+        mtime_ns = meta_path.stat().st_mtime_ns
+    except OSError:
         return None
+    hit = _META_CACHE.get(meta_path)
+    if hit is not None and hit[0] == mtime_ns:
+        return hit[1]
     try:
-        return json.loads(meta_path.read_text(encoding="utf-8"))
+        meta = _loads(meta_path.read_bytes())
     except Exception:
         return None
+    _META_CACHE[meta_path] = (mtime_ns, meta)
+    return meta
+
+
+# Image list cache: forking the docker CLI costs hundreds of ms (daemon
+# round-trip included), and the UI dropdown queries it repeatedly
+_IMAGES_CACHE: Optional[tuple] = None  # (monotonic timestamp, images)
+_IMAGES_CACHE_TTL = 5.0
 
 
 def _list_docker_images() -> list:
-    import subprocess
+    global _IMAGES_CACHE
+    now = time.monotonic()
+    if _IMAGES_CACHE is not None and now - _IMAGES_CACHE[0] < _IMAGES_CACHE_TTL:
+        return _IMAGES_CACHE[1]
     try:
         result = subprocess.run(
             ["docker", "images", "--format", "{{.Repository}}:{{.Tag}}"],
@@ -253,15 +365,13 @@ def _list_docker_images() -> list:
     except Exception:
         return []
 
-    images = []
-    for line in result.stdout.splitlines():
-        line = line.strip()
-        if not line:
-            continue
-        if line == "<none>:<none>" or line.startswith("<none>:") or line.endswith(":<none>"):
-            continue
-        images.append(line)
-    return sorted(set(images))
+    # Dedup, drop untagged/dangling entries, sort — one pass
+    images = sorted({
+        line for line in map(str.strip, result.stdout.splitlines())
+        if line and "<none>" not in line
+    })
+    _IMAGES_CACHE = (now, images)
+    return images
 
 
 @app.get("/api/images")
@@ -273,31 +383,24 @@ def list_images(keyword: str = ""):
     return {"images": images}
 
 
-def _stream_process_output(run_proc: RunProcess):
-    process = run_proc.process
-    exit_code = None
+async def _watch_process(run_proc: RunProcess):
+    # The SDK writes the unified log itself via the bind-mount; the container
+    # process runs with its output discarded, so the watcher only has to
+    # await the exit code (no drain thread, no readline loop)
     try:
-        if process.stdout:
-            for line in iter(process.stdout.readline, ""):
-                if line == "" and process.poll() is not None:
-                    break
-                # Drain stdout to avoid blocking, unified log is written by SDK
-                continue
-        exit_code = process.wait()
+        exit_code = await run_proc.process.wait()
     except Exception:
-        exit_code = process.poll()
+        exit_code = run_proc.process.returncode
         if exit_code is None:
-            try:
-                exit_code = process.wait(timeout=5)
-            except Exception:
-                exit_code = -1
+            exit_code = -1
 
-    with RUNNING_LOCK:
+    async with RUNNING_LOCK:
         run_proc.exit_code = exit_code
         run_proc.ended_at = datetime.now()
         run_proc.status = "success" if exit_code == 0 else "failed"
         meta = run_proc.to_dict()
         _write_run_meta(run_proc.meta_path, meta)
+        _RUN_INDEX[run_proc.run_id] = meta
         RUNNING.pop(run_proc.run_id, None)
 
 
@@ -315,9 +418,9 @@ def _build_run_id() -> str:
 
 
 @app.post("/api/runs")
-def start_run(payload: Optional[RunStartRequest] = None):
+async def start_run(payload: Optional[RunStartRequest] = None):
     # Block multiple runs by default
-    with RUNNING_LOCK:
+    async with RUNNING_LOCK:
         if RUNNING:
             raise HTTPException(status_code=409, detail="Another run is in progress")
 
@@ -376,31 +479,30 @@ def start_run(payload: Optional[RunStartRequest] = None):
         "/tmp/config.yaml",
     ]
 
-    import subprocess
-    process = subprocess.Popen(
-        command,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.STDOUT,
-        text=True,
-        bufsize=1,
+    # Output is discarded at the OS level: the SDK writes its own log file,
+    # so there is no pipe to drain and no thread per run
+    process = await asyncio.create_subprocess_exec(
+        *command,
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.DEVNULL,
     )
 
     run_proc = RunProcess(run_id, process, log_path, run_dir, meta_path)
     meta = run_proc.to_dict()
     _write_run_meta(meta_path, meta)
 
-    with RUNNING_LOCK:
+    async with RUNNING_LOCK:
         RUNNING[run_id] = run_proc
+        _RUN_INDEX[run_id] = meta
 
-    t = threading.Thread(target=_stream_process_output, args=(run_proc,), daemon=True)
-    t.start()
+    asyncio.create_task(_watch_process(run_proc))
 
     return {"ok": True, "run_id": run_id}
 
 
 @app.post("/api/runs/{run_id}/stop")
-def stop_run(run_id: str):
-    with RUNNING_LOCK:
+async def stop_run(run_id: str):
+    async with RUNNING_LOCK:
         run_proc = RUNNING.get(run_id)
 
     if not run_proc:
@@ -410,7 +512,7 @@ def stop_run(run_id: str):
     process.send_signal(signal.SIGTERM)
 
     try:
-        process.wait(timeout=10)
+        await asyncio.wait_for(process.wait(), timeout=10)
     except Exception:
         process.kill()
 
@@ -418,78 +520,164 @@ def stop_run(run_id: str):
 
 
 @app.get("/api/runs")
-def list_runs():
+async def list_runs():
+    _refresh_run_index()
     runs = []
-    for run_dir in sorted(RUNS_DIR.iterdir(), reverse=True):
-        if not run_dir.is_dir():
-            continue
-        meta_path = run_dir / "run.json"
-        meta = _read_run_meta(meta_path) or {
-            "run_id": run_dir.name,
-            "status": "unknown",
-            "started_at": None,
-            "ended_at": None,
-            "exit_code": None,
-            "log_path": str(run_dir / "logs" / "sdk.log"),
-            "config_path": str(CONFIG_PATH),
-        }
-        with RUNNING_LOCK:
-            if run_dir.name in RUNNING:
-                meta["status"] = "running"
+    # Run ids are timestamps, so a key sort is the chronological sort
+    for run_id in sorted(_RUN_INDEX, reverse=True):
+        meta = _RUN_INDEX[run_id]
+        if meta.get("status") not in _TERMINAL_STATUSES:
+            # Not finished from this server's point of view: re-check the
+            # on-disk meta (one cached stat) to pick up runs driven by the
+            # CLI or a previous server process
+            meta = _read_run_meta(RUNS_DIR / run_id / "run.json") or meta
+            _RUN_INDEX[run_id] = meta
+        if run_id in RUNNING:
+            meta["status"] = "running"
         runs.append(meta)
     return {"runs": runs}
 
 
 @app.get("/api/runs/{run_id}")
-def get_run(run_id: str):
+async def get_run(run_id: str):
     run_dir = RUNS_DIR / run_id
     if not run_dir.exists():
         raise HTTPException(status_code=404, detail="Run not found")
     meta_path = run_dir / "run.json"
     meta = _read_run_meta(meta_path)
     if meta is None:
-        meta = {
-            "run_id": run_id,
-            "status": "unknown",
-            "started_at": None,
-            "ended_at": None,
-            "exit_code": None,
-            "log_path": str(run_dir / "logs" / "sdk.log"),
-            "config_path": str(CONFIG_PATH),
-        }
-    with RUNNING_LOCK:
-        if run_id in RUNNING:
-            meta["status"] = "running"
+        meta = _unknown_meta(run_id)
+    # Read-only membership check on the event loop thread: no lock needed
+    if run_id in RUNNING:
+        meta["status"] = "running"
     return meta
 
 
+# Per-poll cap for log tailing: bounds response size and server memory, the
+# client catches up across successive polls via X-Next-Offset
+_LOG_CHUNK_MAX = 1 << 20
+
+
 @app.get("/api/runs/{run_id}/logs")
 def get_run_logs(run_id: str, offset: int = 0):
     log_path = RUNS_DIR / run_id / "logs" / "sdk.log"
-    if not log_path.exists():
+    try:
+        size = os.stat(log_path).st_size
+    except OSError:
         return PlainTextResponse("", headers={"X-Next-Offset": "0"})
 
-    data = log_path.read_bytes()
     if offset < 0:
         offset = 0
-    if offset > len(data):
-        offset = len(data)
+    if offset >= size:
+        return PlainTextResponse("", headers={"X-Next-Offset": str(size)})
+
+    # pread only the new tail instead of read_bytes + slice: the UI polls
+    # every second, and logs grow to tens of MB over a long reconstruction
+    fd = os.open(log_path, os.O_RDONLY)
+    try:
+        chunk = os.pread(fd, min(size - offset, _LOG_CHUNK_MAX), offset)
+    finally:
+        os.close(fd)
 
-    chunk = data[offset:]
     next_offset = offset + len(chunk)
     return PlainTextResponse(chunk.decode("utf-8", errors="ignore"), headers={"X-Next-Offset": str(next_offset)})
 
 
+class _ChunkBuffer(io.RawIOBase):
+    """Write sink for ZipFile that hands finished chunks to the HTTP stream."""
+
+    def __init__(self):
+        self._chunks = []
+        self._offset = 0  # ZipFile uses tell() for the central directory
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._offset += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._offset
+
+    def drain(self) -> list:
+        chunks, self._chunks = self._chunks, []
+        return chunks
+
+
+def _zip_stream(run_dir: Path):
+    """
+    Yield a ZIP archive of run_dir chunk by chunk. ZIP_STORED: the bulk of a
+    run is PLY/imagery that does not deflate meaningfully, and skipping the
+    compressor keeps streaming at disk speed. Each file is copied through
+    the archive in 1MB blocks with a drain per block, so peak memory stays
+    around one block regardless of how large a single splat.ply is.
+    """
+    buffer = _ChunkBuffer()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_STORED) as archive:
+        for root, _dirs, files in os.walk(run_dir):
+            for name in files:
+                file_path = Path(root) / name
+                zinfo = zipfile.ZipInfo.from_file(file_path, file_path.relative_to(run_dir))
+                # force_zip64: splat outputs can exceed the classic 4GB limit
+                with open(file_path, "rb") as src, \
+                        archive.open(zinfo, "w", force_zip64=True) as dst:
+                    while True:
+                        block = src.read(1 << 20)
+                        if not block:
+                            break
+                        dst.write(block)
+                        yield from buffer.drain()
+                yield from buffer.drain()
+    yield from buffer.drain()
+
+
+# Below this size the run is zipped to /tmp and served via FileResponse,
+# which Starlette sends with sendfile(2) on Linux — the kernel copies pages
+# straight to the socket. Larger runs keep the chunked stream so disk usage
+# is never doubled for multi-GB splat outputs.
+_SENDFILE_MAX_BYTES = 64 << 20
+
+
+def _dir_size(run_dir: Path) -> int:
+    total = 0
+    for root, _dirs, files in os.walk(run_dir):
+        for name in files:
+            try:
+                total += os.stat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
 @app.get("/api/runs/{run_id}/download")
 def download_run(run_id: str):
     run_dir = RUNS_DIR / run_id
     if not run_dir.exists():
         raise HTTPException(status_code=404, detail="Run not found")
 
-    import tempfile
-    import shutil
+    if _dir_size(run_dir) <= _SENDFILE_MAX_BYTES:
+        # Small run: materialize the zip once and let the sendfile fast path
+        # push it (no userspace read/write bounce per chunk)
+        zip_path = Path(tempfile.gettempdir()) / f"run_{run_id}.zip"
+        with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_STORED) as archive:
+            for root, _dirs, files in os.walk(run_dir):
+                for name in files:
+                    file_path = Path(root) / name
+                    archive.write(file_path, file_path.relative_to(run_dir))
+        return FileResponse(
+            zip_path,
+            filename=f"run_{run_id}.zip",
+            media_type="application/zip",
+            stat_result=os.stat(zip_path),
+        )
 
-    tmp_dir = Path(tempfile.gettempdir())
-    archive_path = tmp_dir / f"run_{run_id}"
-    zip_path = shutil.make_archive(str(archive_path), "zip", root_dir=str(run_dir))
-    return FileResponse(zip_path, filename=f"run_{run_id}.zip", media_type="application/zip")
+    # Stream the archive as it is built instead of materializing it in /tmp
+    # first (multi-GB splat outputs would double disk usage and stall the
+    # response until the whole zip existed)
+    return StreamingResponse(
+        _zip_stream(run_dir),
+        media_type="application/zip",
+        headers={"Content-Disposition": f"attachment; filename=run_{run_id}.zip"},
+    )